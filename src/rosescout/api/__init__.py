@@ -1,7 +1,27 @@
 """API integration modules."""
 
-from .gpt import OpenAIClient
+import importlib
+
+# Exported name -> submodule. Submodules are imported on first access so that
+# using one client doesn't pull in the other provider's SDK.
+_LAZY_EXPORTS = {
+    "OpenAIClient": "gpt",
+    "GeminiClient": "gemini",
+    "GeminiAPIError": "gemini",
+}
+
+
+def __getattr__(name):
+    if name in _LAZY_EXPORTS:
+        module = importlib.import_module(f".{_LAZY_EXPORTS[name]}", __name__)
+        value = getattr(module, name)
+        globals()[name] = value
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 
 __all__ = [
-    "OpenAIClient"
-]
\ No newline at end of file
+    "OpenAIClient",
+    "GeminiClient",
+    "GeminiAPIError"
+]
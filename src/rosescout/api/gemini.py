@@ -2,18 +2,40 @@
 Async Gemini API wrapper with search functionality and Langfuse observability.
 """
 import os
-import re
+import asyncio
+import time
 import logging
+import functools
+import random
+import reprlib
 from dataclasses import dataclass
-from typing import Optional, Dict, List, Any, Callable, Union
+from typing import Optional, Dict, List, Any, AsyncGenerator, Awaitable, Callable, Tuple, Union
 
 from google import genai
 from google.genai import types
+from google.genai import errors
 from langfuse import observe, get_client
 
+from rosescout.api.limits import ConcurrencyLimit, LoopLocal, read_int_env
+from rosescout.api.response_cache import ResponseCache, cache_key
+
 # Configure logging
 logger = logging.getLogger(__name__)
 
+# How long a fetched Langfuse prompt is reused before fetching it again
+PROMPT_CACHE_TTL_SECONDS = 300
+
+# Bounded repr for logging tool responses without stringifying them in full
+_TOOL_RESPONSE_REPR = reprlib.Repr()
+_TOOL_RESPONSE_REPR.maxstring = 200
+_TOOL_RESPONSE_REPR.maxother = 200
+
+# Backoff for rate-limited or temporarily unavailable Gemini calls
+RETRYABLE_STATUS_CODES = frozenset({429, 503})
+MAX_RETRIES = 4
+RETRY_BASE_DELAY_SECONDS = 1.0
+RETRY_MAX_DELAY_SECONDS = 30.0
+
 @dataclass
 class GroundingSource:
     """Represents a grounding source from Gemini search results."""
@@ -53,6 +75,34 @@ class GeminiAPIError(Exception):
     pass
 
 
+# genai.Client instances per API key, kept separately for each event loop
+_GENAI_CLIENTS = LoopLocal(dict)
+
+
+def _get_genai_client(api_key: str) -> genai.Client:
+    """Return the genai.Client for this API key on the running event loop.
+    
+    GeminiClient instances on the same loop share its connection pool. Its async
+    transport keeps connections bound to the loop that opened them, so other
+    loops get their own client.
+    """
+    clients = _GENAI_CLIENTS.get()
+    client = clients.get(api_key)
+    if client is None:
+        client = clients[api_key] = genai.Client(api_key=api_key)
+    return client
+
+
+@functools.lru_cache(maxsize=16)
+def _get_generation_config(tools: Tuple[Callable, ...]) -> types.GenerateContentConfig:
+    """Build the generation config once per tool set. Callers get copies, never this object."""
+    return types.GenerateContentConfig(
+        thinking_config=types.ThinkingConfig(thinking_budget=-1),
+        tools=list(tools),
+        response_mime_type="text/plain",
+    )
+
+
 class GeminiClient:
     """Async Gemini API client with search capabilities."""
     
@@ -66,29 +116,67 @@ class GeminiClient:
         if not self.api_key:
             raise GeminiAPIError("GEMINI_API_KEY environment variable is required")
         
-        self._client = genai.Client(api_key=self.api_key)
         self._langfuse = get_client()
+        self._prompt_cache: Dict[str, Tuple[float, Any]] = {}
+        # Opt-in cache of (text, trace metadata) for generate_content
+        self._response_cache = ResponseCache()
+        # Last direct prompt registered in Langfuse, as (prompt text, prompt object)
+        self._manual_prompt: Optional[Tuple[str, Any]] = None
+        # Caps in-flight API calls on each event loop
+        self._concurrency = ConcurrencyLimit(read_int_env("GEMINI_MAX_CONCURRENCY", 8, minimum=1))
+    
+    @property
+    def _client(self) -> genai.Client:
+        """The genai.Client shared with other instances on the running loop."""
+        return _get_genai_client(self.api_key)
     
     def _extract_grounding_sources(self, grounding_metadata) -> List[GroundingSource]:
         """Extract grounding sources from metadata."""
         if not grounding_metadata or not grounding_metadata.grounding_chunks:
             return []
         
-        return [
-            GroundingSource(
-                title=chunk.web.title if chunk.web else None,
-                uri=chunk.web.uri if chunk.web else None
-            )
-            for chunk in grounding_metadata.grounding_chunks
-        ]
+        sources = []
+        for chunk in grounding_metadata.grounding_chunks:
+            web = chunk.web
+            # Non-web chunks carry no title or uri to report
+            if web is None:
+                continue
+            sources.append(GroundingSource(title=web.title, uri=web.uri))
+        return sources
     
     def _extract_vertex_links(self, search_entry_html: Optional[str]) -> List[str]:
         """Extract links from search entry HTML."""
         if not search_entry_html:
             return []
         
-        link_pattern = r'<a[^>]+href="([^"]+)"[^>]*>'
-        return re.findall(link_pattern, search_entry_html)
+        # str.find scan returning exactly what
+        # re.findall(r'<a[^>]+href="([^"]+)"[^>]*>') returned, without a regex
+        links = []
+        find = search_entry_html.find
+        rfind = search_entry_html.rfind
+        pos = 0
+        while True:
+            start = find('<a', pos)
+            if start == -1:
+                break
+            tag_end = find('>', start + 2)
+            if tag_end == -1:
+                break
+            # Like the greedy [^>]+, try the last href=" before the first '>' first.
+            # It needs a non-empty quoted value and a '>' somewhere after it
+            match_end = -1
+            href = rfind('href="', start + 3, tag_end)
+            while href != -1:
+                value_end = find('"', href + 6)
+                if value_end > href + 6:
+                    match_end = find('>', value_end + 1)
+                    if match_end != -1:
+                        links.append(search_entry_html[href + 6:value_end])
+                        break
+                href = rfind('href="', start + 3, href + 5)
+            # Resume after the match, or at the next position when there was none
+            pos = match_end + 1 if match_end != -1 else start + 1
+        return links
     
     def _create_usage_metadata(self, usage_metadata) -> Optional[UsageMetadata]:
         """Create UsageMetadata from response."""
@@ -102,64 +190,173 @@ class GeminiClient:
             tool_use_prompt_token_count=usage_metadata.tool_use_prompt_token_count
         )
     
-    def _create_search_metadata(self, response, grounding_sources: List[GroundingSource], 
+    def _create_search_metadata(self, model_version: Optional[str], response_id: Optional[str],
+                               usage_metadata, grounding_metadata,
+                               grounding_sources: List[GroundingSource],
                                vertex_links: List[str]) -> SearchMetadata:
         """Create comprehensive search metadata."""
-        grounding_metadata = response.candidates[0].grounding_metadata
-        
         return SearchMetadata(
-            model=response.model_version,
-            response_id=response.response_id,
-            model_version=response.model_version,
+            model=model_version,
+            response_id=response_id,
+            model_version=model_version,
             web_search_queries=grounding_metadata.web_search_queries if grounding_metadata else None,
             grounding_sources=grounding_sources,
             vertex_links=vertex_links,
-            usage_metadata=self._create_usage_metadata(response.usage_metadata)
+            usage_metadata=self._create_usage_metadata(usage_metadata)
         )
     
-    def _build_generation_config(self, tools: Optional[List[Union[Callable, types.Tool]]] = None) -> types.GenerateContentConfig:
+    def _build_generation_config(self, tools: Optional[List[Callable]] = None) -> types.GenerateContentConfig:
         """Build the generation configuration with specified tools.
         
         Args:
-            tools: List of tools to include (functions or Tool objects)
+            tools: List of tool functions to include
         """
-        tool_list = tools or []
-        
-        return types.GenerateContentConfig(
-            thinking_config=types.ThinkingConfig(thinking_budget=-1),
-            tools=tool_list,
-            response_mime_type="text/plain",
-        )
+        # A copy, so a request that changes its config can't change later ones
+        return _get_generation_config(tuple(tools or [])).model_copy(deep=True)
     
     def _create_content(self, text: str) -> List[types.Content]:
         """Create content objects for the API request."""
         return [
             types.Content(
                 role="user",
-                parts=[types.Part.from_text(text=text)],
+                parts=[types.Part(text=text)],
             )
         ]
     
-    def _log_tool_usage(self, response, tools: List[Callable]):
-        """Log tool usage details."""
-        if not response.candidates or not response.candidates[0].content.parts:
+    def _log_tool_usage(self, tool_parts: List[types.Part], tools: List[Callable]):
+        """Log tool usage details for the parts that carry a function call."""
+        if not tool_parts or not logger.isEnabledFor(logging.INFO):
             return
+        
+        tool_names = {tool.__name__ for tool in tools}
+        for part in tool_parts:
+            func_call = part.function_call
+            if func_call.name in tool_names:
+                logger.info(f"🔧 Tool used: {func_call.name}")
+                logger.info(f"   Arguments: {dict(func_call.args)}")
+                
+                # Log response if available, truncated by the bounded repr
+                if part.function_response:
+                    logger.info(f"   Response: {_TOOL_RESPONSE_REPR.repr(part.function_response.response)}")
+
+    def _get_prompt(self, prompt_name: str):
+        """Fetch a Langfuse prompt, reusing it for PROMPT_CACHE_TTL_SECONDS."""
+        cached = self._prompt_cache.get(prompt_name)
+        now = time.monotonic()
+        if cached and now - cached[0] < PROMPT_CACHE_TTL_SECONDS:
+            return cached[1]
+        
+        langfuse_prompt = self._langfuse.get_prompt(prompt_name)
+        self._prompt_cache[prompt_name] = (now, langfuse_prompt)
+        return langfuse_prompt
+    
+    def _resolve_prompt(
+        self,
+        prompt: Optional[str],
+        prompt_name: Optional[str],
+        prompt_variables: Optional[Dict[str, Any]],
+        generation=None
+    ) -> Tuple[str, str]:
+        """Compile the Langfuse prompt and return its text and a log identifier.
+        
+        The prompt is linked to generation if given, else to the current observed generation.
+        """
+        if not prompt and not prompt_name:
+            raise GeminiAPIError("Either prompt or prompt_name must be provided")
+        
+        # Create manual test prompt if needed
+        if prompt:
+            prompt_name = "manual-test-prompt"
+            if self._manual_prompt and self._manual_prompt[0] == prompt:
+                # Same text as the last call; don't register another version
+                langfuse_prompt = self._manual_prompt[1]
+            else:
+                langfuse_prompt = self._langfuse.create_prompt(
+                    name=prompt_name,
+                    type="text",
+                    prompt=prompt, 
+                    labels=["production"]
+                )
+                self._manual_prompt = (prompt, langfuse_prompt)
+                # The new version replaces whatever was cached under this name
+                self._prompt_cache[prompt_name] = (time.monotonic(), langfuse_prompt)
+            prompt_identifier = f"{prompt_name}: {prompt[:50]}{'...' if len(prompt) > 50 else ''}"
+        else:
+            langfuse_prompt = self._get_prompt(prompt_name)
+            prompt_identifier = f"{prompt_name}"
             
-        for part in response.candidates[0].content.parts:
-            if hasattr(part, 'function_call') and part.function_call:
-                func_call = part.function_call
-                tool_names = [tool.__name__ for tool in tools]
-                if func_call.name in tool_names:
-                    logger.info(f"🔧 Tool used: {func_call.name}")
-                    logger.info(f"   Arguments: {dict(func_call.args)}")
-                    
-                    # Log response if available and not too long
-                    if hasattr(part, 'function_response') and part.function_response:
-                        response_str = str(part.function_response.response)
-                        if len(response_str) <= 200:
-                            logger.info(f"   Response: {response_str}")
-                        else:
-                            logger.info(f"   Response: {response_str[:197]}...")
+        # Compile prompt
+        content_text = langfuse_prompt.compile(**(prompt_variables or {}))
+        if generation is not None:
+            generation.update(prompt=langfuse_prompt)
+        else:
+            self._langfuse.update_current_generation(prompt=langfuse_prompt)
+        return content_text, prompt_identifier
+    
+    async def _call_with_retry(self, call: Callable[[], Awaitable[Any]]) -> Any:
+        """Run an API call under the concurrency cap, backing off on 429/503 errors."""
+        for attempt in range(MAX_RETRIES + 1):
+            try:
+                async with self._concurrency:
+                    return await call()
+            except errors.APIError as e:
+                if e.code not in RETRYABLE_STATUS_CODES or attempt == MAX_RETRIES:
+                    raise
+                # Full jitter, sleeping outside the concurrency limit so the slot is freed
+                delay = random.uniform(0, min(RETRY_MAX_DELAY_SECONDS, RETRY_BASE_DELAY_SECONDS * 2 ** attempt))
+                logger.warning(f"⏳ Gemini returned {e.code}, retrying in {delay:.1f}s ({attempt + 1}/{MAX_RETRIES})")
+                await asyncio.sleep(delay)
+    
+    def _update_trace_metadata(self, response, grounding_metadata, generation=None) -> Dict[str, Any]:
+        """Extract grounding metadata from a response and attach it to the Langfuse trace.
+        
+        The trace is generation's if given, else the current observed one.
+        
+        Returns:
+            The metadata dict sent to Langfuse
+        """
+        grounding_sources = self._extract_grounding_sources(grounding_metadata)
+        
+        search_entry_html = None
+        if grounding_metadata and grounding_metadata.search_entry_point:
+            search_entry_html = grounding_metadata.search_entry_point.rendered_content
+        
+        vertex_links = self._extract_vertex_links(search_entry_html)
+        
+        # Create comprehensive metadata
+        search_metadata = self._create_search_metadata(
+            response.model_version, response.response_id, response.usage_metadata,
+            grounding_metadata, grounding_sources, vertex_links
+        )
+        
+        usage = search_metadata.usage_metadata
+        
+        # Update Langfuse trace with metadata
+        metadata = {
+            "model": search_metadata.model,
+            "response_id": search_metadata.response_id,
+            "model_version": search_metadata.model_version,
+            "web_search_queries": search_metadata.web_search_queries,
+            "grounding_sources_count": len(search_metadata.grounding_sources),
+            "grounding_sources": [
+                {"title": src.title, "uri": src.uri} 
+                for src in search_metadata.grounding_sources
+            ],
+            "has_search_entry_point": bool(search_entry_html),
+            "vertex_links": search_metadata.vertex_links,
+            "vertex_links_count": len(search_metadata.vertex_links),
+            "usage_metadata": {
+                "total_token_count": usage.total_token_count,
+                "prompt_token_count": usage.prompt_token_count,
+                "thoughts_token_count": usage.thoughts_token_count,
+                "tool_use_prompt_token_count": usage.tool_use_prompt_token_count,
+            } if usage else None
+        }
+        if generation is not None:
+            generation.update_trace(metadata=metadata)
+        else:
+            self._langfuse.update_current_trace(metadata=metadata)
+        return metadata
 
     @observe(as_type="generation")
     async def generate_content(
@@ -169,7 +366,8 @@ class GeminiClient:
         prompt: Optional[str] = None,
         prompt_name: Optional[str] = None,
         prompt_variables: Optional[Dict[str, Any]] = None,
-        tools: Optional[List[Callable]] = None
+        tools: Optional[List[Callable]] = None,
+        use_cache: bool = False
     ) -> str:
         """
         Generate content using Gemini with specified tools.
@@ -180,6 +378,8 @@ class GeminiClient:
             prompt_name: Name of the prompt in Langfuse (if not using direct prompt)
             prompt_variables: Variables to substitute in the prompt
             tools: List of tool functions to include
+            use_cache: Reuse the response of an identical earlier call (same model,
+                compiled prompt and tools) made within RESPONSE_CACHE_TTL_SECONDS
             
         Returns:
             Generated text response
@@ -187,27 +387,8 @@ class GeminiClient:
         Raises:
             GeminiAPIError: If API call fails or response is invalid
         """
-        if not prompt and not prompt_name:
-            raise GeminiAPIError("Either prompt or prompt_name must be provided")
-        
         try:
-            # Create manual test prompt if needed
-            if prompt:
-                prompt_name = "manual-test-prompt"
-                self._langfuse.create_prompt(
-                    name=prompt_name,
-                    type="text",
-                    prompt=prompt, 
-                    labels=["production"]
-                )
-                prompt_identifier = f"{prompt_name}: {prompt[:50]}{'...' if len(prompt) > 50 else ''}"
-            else:
-                prompt_identifier = f"{prompt_name}"
-                
-            # Get and compile prompt
-            langfuse_prompt = self._langfuse.get_prompt(prompt_name)
-            content_text = langfuse_prompt.compile(**(prompt_variables or {}))
-            self._langfuse.update_current_generation(prompt=langfuse_prompt)
+            content_text, prompt_identifier = self._resolve_prompt(prompt, prompt_name, prompt_variables)
             # Log the Gemini call
             logger.info(f"🤖 Gemini call - Model: {model}, Prompt: {prompt_identifier}")
             
@@ -219,70 +400,175 @@ class GeminiClient:
                 tool_names = [tool.__name__ for tool in tool_list]
                 logger.info(f"🔧 Selected tools: {', '.join(tool_names)}")
             
+            response_key = None
+            if use_cache:
+                # Everything that determines a response: model, compiled prompt and tools
+                response_key = cache_key(
+                    {"model": model, "content": content_text, "tools": [tool.__name__ for tool in tool_list]}
+                )
+                cached = self._response_cache.get(response_key)
+                if cached:
+                    logger.info("💾 Gemini response served from cache")
+                    text, metadata = cached
+                    self._langfuse.update_current_trace(metadata=metadata)
+                    return text
+            
             # Create request content and config
             contents = self._create_content(content_text)
             config = self._build_generation_config(tool_list)
             
             # Make async API call
-            response = await self._client.aio.models.generate_content(
-                model=model,
-                contents=contents,
-                config=config,
+            response = await self._call_with_retry(
+                lambda: self._client.aio.models.generate_content(
+                    model=model,
+                    contents=contents,
+                    config=config,
+                )
             )
             
-            # Log tool usage
-            self._log_tool_usage(response, tool_list or [])
-            
             # Validate response
-            if not response.candidates or not response.candidates[0].content.parts:
+            candidate = response.candidates[0] if response.candidates else None
+            parts = candidate.content.parts if candidate else None
+            if not parts:
                 raise GeminiAPIError("Invalid response from Gemini API")
             
-            # Extract response text
-            text = response.candidates[0].content.parts[0].text
+            # Collect the response text and tool calls in one pass over the parts
+            text_chunks = []
+            tool_parts = []
+            for part in parts:
+                if part.text and not part.thought:
+                    text_chunks.append(part.text)
+                if part.function_call:
+                    tool_parts.append(part)
+            text = "".join(text_chunks)
+            
+            # Log tool usage
+            self._log_tool_usage(tool_parts, tool_list)
             
             # Extract and process grounding metadata for Langfuse
-            grounding_metadata = response.candidates[0].grounding_metadata
-            grounding_sources = self._extract_grounding_sources(grounding_metadata)
+            metadata = self._update_trace_metadata(response, candidate.grounding_metadata)
             
-            search_entry_html = None
-            if grounding_metadata and grounding_metadata.search_entry_point:
-                search_entry_html = grounding_metadata.search_entry_point.rendered_content
+            if response_key:
+                self._response_cache.set(response_key, (text, metadata))
             
-            vertex_links = self._extract_vertex_links(search_entry_html)
+            return text
             
-            # Create comprehensive metadata
-            search_metadata = self._create_search_metadata(response, grounding_sources, vertex_links)
+        except Exception as e:
+            if isinstance(e, GeminiAPIError):
+                raise
+            raise GeminiAPIError(f"Failed to generate content: {str(e)}") from e
+
+    async def stream_content(
+        self, 
+        *,
+        model: str,
+        prompt: Optional[str] = None,
+        prompt_name: Optional[str] = None,
+        prompt_variables: Optional[Dict[str, Any]] = None,
+        tools: Optional[List[Callable]] = None
+    ) -> AsyncGenerator[str, None]:
+        """
+        Stream content using Gemini with specified tools.
+        
+        Takes the same arguments as generate_content. Grounding metadata is
+        attached to the Langfuse trace once the stream finishes.
+        
+        Yields:
+            Text deltas as they arrive
             
-            # Update Langfuse trace with metadata
-            self._langfuse.update_current_trace(
-                metadata={
-                    "model": search_metadata.model,
-                    "response_id": search_metadata.response_id,
-                    "model_version": search_metadata.model_version,
-                    "web_search_queries": search_metadata.web_search_queries,
-                    "grounding_sources_count": len(search_metadata.grounding_sources),
-                    "grounding_sources": [
-                        {"title": src.title, "uri": src.uri} 
-                        for src in search_metadata.grounding_sources
-                    ],
-                    "has_search_entry_point": bool(search_entry_html),
-                    "vertex_links": search_metadata.vertex_links,
-                    "vertex_links_count": len(search_metadata.vertex_links),
-                    "usage_metadata": {
-                        "total_token_count": search_metadata.usage_metadata.total_token_count,
-                        "prompt_token_count": search_metadata.usage_metadata.prompt_token_count,
-                        "thoughts_token_count": search_metadata.usage_metadata.thoughts_token_count,
-                        "tool_use_prompt_token_count": search_metadata.usage_metadata.tool_use_prompt_token_count,
-                    } if search_metadata.usage_metadata else None
-                }
+        Raises:
+            GeminiAPIError: If API call fails
+        """
+        # Not @observe: the body of an async generator runs after the decorator
+        # has left its span, so the prompt and trace updates would miss it.
+        # The generation is opened here and updated directly instead
+        generation = self._langfuse.start_generation(name="stream_content", model=model)
+        output_chunks = []
+        try:
+            content_text, prompt_identifier = self._resolve_prompt(
+                prompt, prompt_name, prompt_variables, generation
             )
+            generation.update(input=content_text)
+            logger.info(f"🤖 Gemini streaming call - Model: {model}, Prompt: {prompt_identifier}")
             
-            return text
+            tool_list = tools or []
+            if tool_list:
+                tool_names = [tool.__name__ for tool in tool_list]
+                logger.info(f"🔧 Selected tools: {', '.join(tool_names)}")
+            
+            contents = self._create_content(content_text)
+            config = self._build_generation_config(tool_list)
+            
+            # Hold the slot for the whole stream, since the request is in flight until it ends.
+            # Streams aren't retried: chunks may already have been yielded
+            async with self._concurrency:
+                stream = await self._client.aio.models.generate_content_stream(
+                    model=model,
+                    contents=contents,
+                    config=config,
+                )
+            
+                last_chunk = None
+                grounding_metadata = None
+                async for chunk in stream:
+                    last_chunk = chunk
+                    if chunk.candidates:
+                        # Grounding metadata usually arrives with the final chunks
+                        chunk_grounding = chunk.candidates[0].grounding_metadata
+                        if chunk_grounding:
+                            grounding_metadata = chunk_grounding
+                    if chunk.text:
+                        output_chunks.append(chunk.text)
+                        yield chunk.text
+            
+            if last_chunk is None:
+                raise GeminiAPIError("Empty stream from Gemini API")
+            
+            self._update_trace_metadata(last_chunk, grounding_metadata, generation)
             
         except Exception as e:
+            generation.update(level="ERROR", status_message=str(e))
             if isinstance(e, GeminiAPIError):
                 raise
-            raise GeminiAPIError(f"Failed to generate content: {str(e)}") from e
-    
-
+            raise GeminiAPIError(f"Failed to stream content: {str(e)}") from e
+        finally:
+            generation.update(output="".join(output_chunks))
+            generation.end()
 
+    async def generate_content_batch(
+        self,
+        requests: List[Dict[str, Any]],
+        *,
+        max_concurrency: int = 8
+    ) -> List[Union[str, GeminiAPIError]]:
+        """
+        Run several generate_content calls concurrently.
+        
+        Args:
+            requests: Keyword arguments for each generate_content call
+            max_concurrency: Maximum number of calls in flight at once
+            
+        Returns:
+            One entry per request, in order: the generated text, or the
+            GeminiAPIError raised for that request
+            
+        Raises:
+            Any other exception from a request (e.g. a TypeError for bad
+            arguments), after cancelling the rest of the batch
+        """
+        semaphore = asyncio.Semaphore(max_concurrency)
+        
+        async def run_one(kwargs: Dict[str, Any]) -> Union[str, GeminiAPIError]:
+            async with semaphore:
+                try:
+                    return await self.generate_content(**kwargs)
+                except GeminiAPIError as e:
+                    return e
+        
+        tasks = [asyncio.ensure_future(run_one(kwargs)) for kwargs in requests]
+        try:
+            return await asyncio.gather(*tasks)
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            raise
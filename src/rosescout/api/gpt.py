@@ -4,13 +4,23 @@ OpenAI API wrapper with streaming and async support.
 import os
 import logging
 import json
+import time
+import functools
 from dataclasses import dataclass
-from typing import Optional, Dict, List, Any, AsyncGenerator
+from typing import Optional, Dict, List, Any, AsyncGenerator, Tuple
 
 from openai import OpenAI, AsyncOpenAI
 
+from rosescout.api.limits import ConcurrencyLimit, RateLimiter, read_int_env
+from rosescout.api.response_cache import ResponseCache, cache_key
+
 logger = logging.getLogger(__name__)
 
+# Model families that accept the reasoning parameter; others reject or ignore it
+REASONING_MODEL_PREFIXES = ("o1", "o3", "o4", "gpt-5")
+# Non-reasoning variants inside those families (e.g. gpt-5-chat-latest), which reject it
+NON_REASONING_MODEL_MARKERS = ("-chat",)
+
 
 @dataclass
 class ToolCall:
@@ -28,7 +38,7 @@ class Annotation:
     source: Optional[str] = None
 
 
-@dataclass
+@dataclass(frozen=True)
 class MCPTool:
     """MCP tool configuration."""
     server_label: str
@@ -46,25 +56,121 @@ class AIResponse:
     model: Optional[str] = None
 
 
+def _accepts_reasoning(model: str) -> bool:
+    """Whether the model takes the reasoning parameter."""
+    return model.startswith(REASONING_MODEL_PREFIXES) and not any(
+        marker in model for marker in NON_REASONING_MODEL_MARKERS
+    )
+
+
+def _field(obj: Any, name: str, default: Any = None) -> Any:
+    """Read a field from either an SDK object or its dict form (streaming events)."""
+    if isinstance(obj, dict):
+        return obj.get(name, default)
+    return getattr(obj, name, default)
+
+
+def _handle_message(item, texts: List[str], tool_calls: List[ToolCall], annotations: List[Annotation]):
+    """Collect output text and its annotations (e.g., URL citations)."""
+    # Bound once: a cited answer can carry hundreds of annotations
+    field = _field
+    add_annotation = annotations.append
+    for content_item in field(item, 'content', []):
+        if field(content_item, 'type') != 'output_text':
+            continue
+        texts.append(field(content_item, 'text', ''))
+        for annotation in field(content_item, 'annotations', []):
+            add_annotation(Annotation(
+                type=field(annotation, 'type', 'unknown'),
+                content=field(annotation, 'title', '') or field(annotation, 'text', ''),
+                source=field(annotation, 'url', '') or field(annotation, 'source', '')
+            ))
+
+
+def _handle_web_search_call(item, texts: List[str], tool_calls: List[ToolCall], annotations: List[Annotation]):
+    """Record a web search call."""
+    tool_calls.append(ToolCall(
+        name='web_search',
+        arguments={
+            'query': _field(item, 'query', ''),
+            'status': _field(item, 'status', 'unknown')
+        },
+        # Dict events carry results under 'results', SDK objects under 'output'
+        output=item.get('results', []) if isinstance(item, dict) else getattr(item, 'output', [])
+    ))
+
+
+def _handle_mcp_call(item, texts: List[str], tool_calls: List[ToolCall], annotations: List[Annotation]):
+    """Record an MCP tool call."""
+    tool_calls.append(ToolCall(
+        name=_field(item, 'name', 'mcp_tool'),
+        arguments=_field(item, 'arguments', {}),
+        output=_field(item, 'output')
+    ))
+
+
+def _handle_function_call(item, texts: List[str], tool_calls: List[ToolCall], annotations: List[Annotation]):
+    """Record a function call."""
+    tool_calls.append(ToolCall(
+        name=_field(item, 'name', 'function'),
+        arguments=_field(item, 'arguments', {}),
+        output=_field(item, 'output')
+    ))
+
+
+# Response output item type -> handler, so each item is dispatched with one lookup
+_OUTPUT_HANDLERS = {
+    'message': _handle_message,
+    'web_search_call': _handle_web_search_call,
+    'mcp_call': _handle_mcp_call,
+    'function_call': _handle_function_call,
+}
+
+
 class OpenAIClient:
     """Simple OpenAI API client with streaming and async support."""
-    def __init__(self, api_key: Optional[str] = None):
-        """Initialize OpenAI client."""
+    def __init__(self, api_key: Optional[str] = None, rpm: Optional[int] = None):
+        """Initialize OpenAI client.
+        
+        Args:
+            api_key: OpenAI API key, defaults to OPENAI_API_KEY
+            rpm: Requests per minute to allow from this client, defaults to
+                OPENAI_RPM; 0 or unset disables client-side rate limiting
+        
+        Raises:
+            ValueError: If the API key is missing or a limit is invalid
+        """
         self.api_key = api_key or os.getenv("OPENAI_API_KEY")
         if not self.api_key:
             raise ValueError("OPENAI_API_KEY environment variable is required")
         self.client = AsyncOpenAI(api_key=self.api_key)
-        self.sync_client = OpenAI(api_key=self.api_key)
         self._last_streaming_response = None
+        # Opt-in cache of AIResponse for generate_content
+        self._response_cache = ResponseCache()
+        # Caps in-flight API calls on each event loop
+        self._concurrency = ConcurrencyLimit(read_int_env("OPENAI_MAX_CONCURRENCY", 16, minimum=1))
+        self._rate_limiter = RateLimiter(rpm if rpm is not None else read_int_env("OPENAI_RPM", 0, minimum=0))
+    
+    @functools.cached_property
+    def sync_client(self) -> OpenAI:
+        """Sync client, built on first use so async-only callers skip its connection pool."""
+        return OpenAI(api_key=self.api_key)
     
     def _build_tools(
         self, mcp_tools: Optional[List[MCPTool]] = None, web_search: bool = False
-    ) -> Optional[List[Dict]]:
-        """Build tools array for OpenAI Responses API."""
+    ) -> Tuple[Optional[List[Dict]], List[str]]:
+        """Build tools array for OpenAI Responses API.
+        
+        Returns:
+            The tools array (None if empty) and the MCP server labels, for logging
+        """
         tools = []
-        # Add MCP tools (passed as MCPTool dataclasses)
+        labels = []
+        # Add MCP tools (passed as MCPTool dataclasses), sorted by label so the
+        # same tool set always produces the same tools prefix for prompt caching
         if mcp_tools:
-            for mcp_tool in mcp_tools:
+            for mcp_tool in sorted(mcp_tools, key=lambda tool: tool.server_label):
+                labels.append(mcp_tool.server_label)
                 tools.append({
                     "type": "mcp",
                     "server_label": mcp_tool.server_label,
@@ -76,7 +182,7 @@ class OpenAIClient:
             tools.append({
                 "type": "web_search"
             })
-        return tools if tools else None
+        return (tools if tools else None), labels
     
     def _extract_response_data(self, response) -> AIResponse:
         """Extract all data from response into structured format.
@@ -84,126 +190,33 @@ class OpenAIClient:
         Handles both direct response objects and dictionary representations
         from streaming events.
         """
+        texts = []
         tool_calls = []
         annotations = []
-        text = ""
-        
-        # Handle both object and dict formats
-        if isinstance(response, dict):
-            output_data = response.get('output', [])
-            usage_data = response.get('usage')
-            model_data = response.get('model')
-        else:
-            output_data = getattr(response, 'output', [])
-            usage_data = getattr(response, 'usage', None)
-            model_data = getattr(response, 'model', None)
         
         # Extract from response.output array (correct API structure)
-        if output_data:
-            for output_item in output_data:
-                # Handle both dict and object formats for output items
-                item_type = output_item.get('type') if isinstance(output_item, dict) else getattr(output_item, 'type', None)
-                
-                # Handle message type - main text content
-                if item_type == 'message':
-                    # Extract text and annotations from message content
-                    content = output_item.get('content', []) if isinstance(output_item, dict) else getattr(output_item, 'content', [])
-                    for content_item in content:
-                        content_type = content_item.get('type') if isinstance(content_item, dict) else getattr(content_item, 'type', None)
-                        if content_type == 'output_text':
-                            text = content_item.get('text', '') if isinstance(content_item, dict) else getattr(content_item, 'text', '')
-
-                            # Extract annotations (e.g., URL citations)
-                            annotations_data = content_item.get('annotations', []) if isinstance(content_item, dict) else getattr(content_item, 'annotations', [])
-                            for annotation in annotations_data:
-                                if isinstance(annotation, dict):
-                                    annotations.append(Annotation(
-                                        type=annotation.get('type', 'unknown'),
-                                        content=annotation.get('title', '') or annotation.get('text', ''),
-                                        source=annotation.get('url', '') or annotation.get('source', '')
-                                    ))
-                                else:
-                                    annotations.append(Annotation(
-                                        type=getattr(annotation, 'type', 'unknown'),
-                                        content=(getattr(annotation, 'title', '') or
-                                                 getattr(annotation, 'text', '')),
-                                        source=(getattr(annotation, 'url', '') or
-                                                getattr(annotation, 'source', ''))
-                                    ))
-                
-                # Handle web search calls
-                elif item_type == 'web_search_call':
-                    if isinstance(output_item, dict):
-                        tool_calls.append(ToolCall(
-                            name='web_search',
-                            arguments={
-                                'query': output_item.get('query', ''),
-                                'status': output_item.get('status', 'unknown')
-                            },
-                            output=output_item.get('results', [])
-                        ))
-                    else:
-                        tool_calls.append(ToolCall(
-                            name='web_search',
-                            arguments={
-                                'query': getattr(output_item, 'query', ''),
-                                'status': getattr(output_item, 'status', 'unknown')
-                            },
-                            output=getattr(output_item, 'output', [])
-                        ))
-                
-                # Handle MCP calls
-                elif item_type == 'mcp_call':
-                    if isinstance(output_item, dict):
-                        tool_calls.append(ToolCall(
-                            name=output_item.get('name', 'mcp_tool'),
-                            arguments=output_item.get('arguments', {}),
-                            output=output_item.get('output', None)
-                        ))
-                    else:
-                        tool_calls.append(ToolCall(
-                            name=getattr(output_item, 'name', 'mcp_tool'),
-                            arguments=getattr(output_item, 'arguments', {}),
-                            output=getattr(output_item, 'output', None)
-                        ))
-                
-                # Handle function calls
-                elif item_type == 'function_call':
-                    if isinstance(output_item, dict):
-                        tool_calls.append(ToolCall(
-                            name=output_item.get('name', 'function'),
-                            arguments=output_item.get('arguments', {}),
-                            output=output_item.get('output', None)
-                        ))
-                    else:
-                        tool_calls.append(ToolCall(
-                            name=getattr(output_item, 'name', 'function'),
-                            arguments=getattr(output_item, 'arguments', {}),
-                            output=getattr(output_item, 'output', None)
-                        ))
+        get_handler = _OUTPUT_HANDLERS.get
+        for output_item in _field(response, 'output', []) or []:
+            handler = get_handler(_field(output_item, 'type'))
+            if handler:
+                handler(output_item, texts, tool_calls, annotations)
+        
+        text = texts[-1] if texts else ""
         if not text:
             text = getattr(response, 'text', '')
-        # Extract response ID for conversation continuity
-        response_id = None
-        if isinstance(response, dict):
-            response_id = response.get('id')
-        else:
-            response_id = getattr(response, 'id', None)
-            
+        
+        usage_data = _field(response, 'usage')
         return AIResponse(
             text=text,
             tool_calls=tool_calls,
             annotations=annotations,
-            response_id=response_id,
+            response_id=_field(response, 'id'),  # For conversation continuity
             usage={
-                "total_tokens": (usage_data.get('total_tokens') if isinstance(usage_data, dict) 
-                               else getattr(usage_data, 'total_tokens', None) if usage_data else None),
-                "input_tokens": (usage_data.get('input_tokens') if isinstance(usage_data, dict)
-                                else getattr(usage_data, 'input_tokens', None) if usage_data else None),
-                "output_tokens": (usage_data.get('output_tokens') if isinstance(usage_data, dict)
-                                 else getattr(usage_data, 'output_tokens', None) if usage_data else None),
+                "total_tokens": _field(usage_data, 'total_tokens'),
+                "input_tokens": _field(usage_data, 'input_tokens'),
+                "output_tokens": _field(usage_data, 'output_tokens'),
             } if usage_data else None,
-            model=model_data
+            model=_field(response, 'model')
         )
     
     async def generate_content(
@@ -215,7 +228,8 @@ class OpenAIClient:
         user_prompt: str,
         mcp_tools: Optional[List[MCPTool]] = None,
         web_search: bool = False,
-        previous_response_id: Optional[str] = None
+        previous_response_id: Optional[str] = None,
+        use_cache: bool = False
     ) -> AIResponse:
         """
         Generate content using OpenAI Responses API.
@@ -228,16 +242,18 @@ class OpenAIClient:
             mcp_tools: List of MCPTool dataclasses
             web_search: Whether to use web search
             previous_response_id: Previous response ID for conversation continuity
+            use_cache: Reuse the response of an identical earlier call made within
+                RESPONSE_CACHE_TTL_SECONDS. Ignored for web search and MCP calls,
+                whose results depend on live external data
             
         Returns:
             AIResponse with text, tool calls, and annotations
         """
         logger.info("🤖 OpenAI call - Model: %s", model)
 
-        tools = self._build_tools(mcp_tools, web_search)
+        tools, tool_labels = self._build_tools(mcp_tools, web_search)
 
-        if mcp_tools:
-            tool_labels = [tool.server_label for tool in mcp_tools]
+        if tool_labels:
             logger.info("🔧 MCP tools: %s", ', '.join(tool_labels))
         if web_search:
             logger.info("🔍 Web search enabled")
@@ -245,8 +261,9 @@ class OpenAIClient:
         request_params = {
             "model": model,
             "input": user_prompt,
-            "reasoning": {"effort": "medium"},
         }
+        if _accepts_reasoning(model):
+            request_params["reasoning"] = {"effort": "medium"}
 
         # Use prompt ID if provided, otherwise use system_prompt
         if system_prompt:
@@ -259,11 +276,26 @@ class OpenAIClient:
             
         if previous_response_id:
             request_params["previous_response_id"] = previous_response_id
-        # Make API call using responses API
-        response = await self.client.responses.create(**request_params)
+
+        response_key = None
+        if use_cache and not tools:
+            response_key = cache_key(request_params)
+            cached = self._response_cache.get(response_key)
+            if cached:
+                logger.info("💾 OpenAI response served from cache")
+                return cached
+
+        # Make API call using responses API. The rate limit is waited out
+        # first, so the wait doesn't hold a concurrency slot
+        await self._rate_limiter.wait()
+        async with self._concurrency:
+            response = await self.client.responses.create(**request_params)
 
         # Extract all data from response
         ai_response = self._extract_response_data(response)
+        
+        if response_key:
+            self._response_cache.set(response_key, ai_response)
 
         # Log tool usage
         if ai_response.tool_calls:
@@ -281,7 +313,9 @@ class OpenAIClient:
         user_prompt: str,
         mcp_tools: Optional[List[MCPTool]] = None,
         web_search: bool = False,
-        previous_response_id: Optional[str] = None
+        previous_response_id: Optional[str] = None,
+        buffer_size: int = 8192,
+        flush_seconds: float = 0.025
     ) -> AsyncGenerator[str, None]:
         """
         Stream content using OpenAI Responses API.
@@ -294,16 +328,18 @@ class OpenAIClient:
             mcp_tools: List of MCPTool dataclasses
             web_search: Whether to use web search
             previous_response_id: Previous response ID for conversation continuity
+            buffer_size: Yield buffered deltas once they reach this many characters
+            flush_seconds: Yield buffered deltas once this long has passed since the
+                last yield; pass 0 to yield every delta as it arrives
             
         Yields:
-            Text deltas as they arrive
+            Text chunks made of one or more coalesced deltas
         """
         logger.info("🤖 OpenAI streaming call - Model: %s", model)
 
-        tools = self._build_tools(mcp_tools, web_search)
+        tools, tool_labels = self._build_tools(mcp_tools, web_search)
 
-        if mcp_tools:
-            tool_labels = [tool.server_label for tool in mcp_tools]
+        if tool_labels:
             logger.info("🔧 MCP tools: %s", ', '.join(tool_labels))
         if web_search:
             logger.info("🔍 Web search enabled")
@@ -312,8 +348,9 @@ class OpenAIClient:
             "model": model,
             "input": user_prompt,
             "stream": True,
-            "reasoning": {"effort": "medium"},
         }
+        if _accepts_reasoning(model):
+            request_params["reasoning"] = {"effort": "medium"}
 
         # Use prompt ID if provided, otherwise use system_prompt
         if prompt_id:
@@ -327,40 +364,64 @@ class OpenAIClient:
         if previous_response_id:
             request_params["previous_response_id"] = previous_response_id
         # Make streaming API call using responses API
-        stream = await self.client.responses.create(**request_params)
+        # Hold the slot for the whole stream, since the request is in flight until it ends
+        await self._rate_limiter.wait()
+        async with self._concurrency:
+            stream = await self.client.responses.create(**request_params)
         
-        complete_response = None
+            complete_response = None
+            buffer = []
+            buffered_chars = 0
+            last_flush = time.monotonic()
         
-        async for event in stream:
-            # Extract content from event based on responses API streaming format
-            event_type = getattr(event, 'type', None)
+            async for event in stream:
+                # Extract content from event based on responses API streaming format
+                event_type = getattr(event, 'type', None)
             
-            # Capture the complete response when streaming finishes
-            if event_type == 'response.completed':
-                # Extract the complete response data from the event
-                if hasattr(event, 'response'):
-                    complete_response = event.response
-                elif hasattr(event, 'data'):
-                    # Handle case where response is in JSON format
-                    try:
-                        event_data = json.loads(event.data) if isinstance(event.data, str) else event.data
-                        complete_response = event_data.get('response')
-                    except (json.JSONDecodeError, AttributeError):
-                        pass
+                # Capture the complete response when streaming finishes
+                if event_type == 'response.completed':
+                    # Extract the complete response data from the event
+                    if hasattr(event, 'response'):
+                        complete_response = event.response
+                    elif hasattr(event, 'data'):
+                        # Handle case where response is in JSON format
+                        try:
+                            event_data = json.loads(event.data) if isinstance(event.data, str) else event.data
+                            complete_response = event_data.get('response')
+                        except (json.JSONDecodeError, AttributeError):
+                            pass
+                    continue
+            
+                # Collect text deltas for streaming
+                text = None
+                if event_type == 'response.output_text.delta':
+                    text = getattr(event, 'delta', None)
+                elif event_type == 'response.output_text.done':
+                    # Final text chunk - usually not needed as deltas provide complete text
+                    pass
+                elif hasattr(event, 'choices') and event.choices:
+                    # Handle Chat Completions streaming format as fallback
+                    delta = event.choices[0].delta
+                    if hasattr(delta, 'content') and delta.content:
+                        text = delta.content
+                if text:
+                    # Coalesce small deltas so consumers run once per chunk, not per token
+                    buffer.append(text)
+                    buffered_chars += len(text)
+                elif not buffer:
+                    continue
+                
+                # Any other event (text done, tool call starting...) flushes the
+                # buffer, so text before a slow tool call isn't held back
+                now = time.monotonic()
+                if not text or buffered_chars >= buffer_size or now - last_flush >= flush_seconds:
+                    yield "".join(buffer)
+                    buffer.clear()
+                    buffered_chars = 0
+                    last_flush = now
             
-            # Yield text deltas for streaming
-            elif event_type == 'response.output_text.delta':
-                delta = getattr(event, 'delta', None)
-                if delta:
-                    yield delta
-            elif event_type == 'response.output_text.done':
-                # Final text chunk - usually not needed as deltas provide complete text
-                pass
-            elif hasattr(event, 'choices') and event.choices:
-                # Handle Chat Completions streaming format as fallback
-                delta = event.choices[0].delta
-                if hasattr(delta, 'content') and delta.content:
-                    yield delta.content
+            if buffer:
+                yield "".join(buffer)
         
         # Store the complete response for later retrieval
         self._last_streaming_response = complete_response
@@ -0,0 +1,120 @@
+"""
+Concurrency and rate limits shared by the API clients.
+"""
+import os
+import asyncio
+import heapq
+import threading
+import time
+import weakref
+from typing import Any, Callable, List
+
+
+def read_int_env(name: str, default: int, minimum: int) -> int:
+    """Read an integer setting from the environment.
+
+    Args:
+        name: Environment variable name
+        default: Value used when the variable is unset or empty
+        minimum: Smallest accepted value
+
+    Raises:
+        ValueError: If the value is not an integer or is below minimum
+    """
+    raw = os.getenv(name, "").strip()
+    if not raw:
+        return default
+    try:
+        value = int(raw)
+    except ValueError:
+        raise ValueError(f"{name} must be an integer, got {raw!r}") from None
+    if value < minimum:
+        raise ValueError(f"{name} must be at least {minimum}, got {value}")
+    return value
+
+
+class LoopLocal:
+    """One value per event loop, built by factory on first use in that loop.
+
+    asyncio primitives and async HTTP transports bind to the loop that first
+    uses them, so a client used from several loops needs one of each per loop.
+    Values are dropped once their loop is garbage collected.
+    """
+
+    def __init__(self, factory: Callable[[], Any]):
+        self._factory = factory
+        self._values: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Any]" = weakref.WeakKeyDictionary()
+        # Loops can live in different threads
+        self._lock = threading.Lock()
+
+    def get(self) -> Any:
+        """Return the value for the running loop."""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            value = self._values.get(loop)
+            if value is None:
+                value = self._values[loop] = self._factory()
+            return value
+
+
+class ConcurrencyLimit:
+    """Async context manager capping in-flight calls at limit per event loop."""
+
+    def __init__(self, limit: int):
+        if limit < 1:
+            raise ValueError(f"Concurrency limit must be at least 1, got {limit}")
+        self.limit = limit
+        self._semaphores = LoopLocal(lambda: asyncio.Semaphore(limit))
+
+    async def __aenter__(self):
+        await self._semaphores.get().acquire()
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self._semaphores.get().release()
+
+
+class RateLimiter:
+    """Spaces out request starts to stay under a requests-per-minute limit."""
+
+    def __init__(self, rpm: int):
+        """
+        Args:
+            rpm: Requests per minute; 0 disables the limit
+        """
+        if rpm < 0:
+            raise ValueError(f"Requests per minute must be 0 (no limit) or more, got {rpm}")
+        self.rpm = rpm
+        self._interval = 60.0 / rpm if rpm else 0.0
+        self._next_slot = 0.0
+        # Start times reserved by waiters that were cancelled, as a heap
+        self._freed_slots: List[float] = []
+
+    async def wait(self):
+        """Wait until another request may start.
+
+        Each caller reserves a slot before sleeping, so concurrent callers queue
+        up in order. A caller cancelled while waiting gives its slot back.
+        """
+        if not self._interval:
+            return
+        now = time.monotonic()
+        # A freed slot that has already passed can't be reused without crowding
+        # the next reserved slot
+        while self._freed_slots and self._freed_slots[0] <= now:
+            heapq.heappop(self._freed_slots)
+        if self._freed_slots:
+            slot = heapq.heappop(self._freed_slots)
+        else:
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + self._interval
+        if slot <= now:
+            return
+        try:
+            await asyncio.sleep(slot - now)
+        except asyncio.CancelledError:
+            if self._next_slot == slot + self._interval:
+                # Latest reservation: later callers can simply start from here
+                self._next_slot = slot
+            else:
+                heapq.heappush(self._freed_slots, slot)
+            raise
@@ -0,0 +1,56 @@
+"""
+Opt-in exact-match response cache shared by the API clients.
+"""
+import copy
+import json
+import time
+import hashlib
+from collections import OrderedDict
+from typing import Any, Optional, Tuple
+
+RESPONSE_CACHE_TTL_SECONDS = 3600
+RESPONSE_CACHE_MAX_ENTRIES = 256
+
+
+def cache_key(payload: Any) -> str:
+    """Hash a JSON-serialisable description of everything that determines a response."""
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode()).hexdigest()
+
+
+class ResponseCache:
+    """In-process LRU cache whose entries expire after ttl_seconds.
+
+    Values are deep-copied on the way in and out, so mutating a stored or
+    returned response never changes what later hits see.
+    """
+
+    def __init__(
+        self,
+        ttl_seconds: float = RESPONSE_CACHE_TTL_SECONDS,
+        max_entries: int = RESPONSE_CACHE_MAX_ENTRIES
+    ):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+
+    def get(self, key: str) -> Optional[Any]:
+        """Return a copy of the value for key, or None if missing or expired."""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        stored_at, value = entry
+        if time.monotonic() - stored_at >= self.ttl_seconds:
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return copy.deepcopy(value)
+
+    def set(self, key: str, value: Any):
+        """Store a copy of value, evicting the least recently used entry when full."""
+        self._entries[key] = (time.monotonic(), copy.deepcopy(value))
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._entries)
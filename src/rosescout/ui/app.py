@@ -2,13 +2,18 @@
 Streamlit app for Gemini API search interface with configurable prompt variables.
 """
 import asyncio
+import atexit
 import json
 import logging
+import os
+import secrets
 import threading
-import uuid
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from types import MappingProxyType
 from dataclasses import dataclass
 from datetime import datetime
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, Mapping, Optional
 
 import streamlit as st
 from dotenv import load_dotenv
@@ -18,32 +23,84 @@ load_dotenv()
 
 from rosescout.api.gpt import OpenAIClient, MCPTool
 
+# How often the script thread refreshes the placeholder while a search streams
+POLL_INTERVAL_SECONDS = 0.1
+
 
 @dataclass
 class SearchRequest:
     id: str
     prompt_variables: Dict[str, str]
     timestamp: datetime
-    status: str  # 'pending', 'running', 'streaming', 'completed', 'error'
+    status: str  # 'pending', 'running', 'streaming', 'completed', 'error', 'cancelled'
     web_search: bool = False
     result: Optional[str] = None
     error: Optional[str] = None
     custom_prompt: Optional[str] = None
     partial_result: Optional[str] = None  # For streaming responses
+    future: Optional[Future] = None  # Handle to the running search
 
 
 class SearchManager:
     def __init__(self):
+        # Writers swap in a new snapshot under the lock; readers use the current one lock-free
         self._lock = threading.Lock()
-        self._requests = []
+        self._requests: Mapping[str, SearchRequest] = MappingProxyType({})
+        # All searches run as coroutines on one background event loop
+        self._loop = asyncio.new_event_loop()
+        # Blocking work the SDKs push to the default executor (e.g. DNS lookups)
+        self._executor = ThreadPoolExecutor(
+            max_workers=int(os.getenv("THREAD_POOL_SIZE", "64")),
+            thread_name_prefix="search"
+        )
+        self._loop.set_default_executor(self._executor)
+        self._loop_thread = threading.Thread(
+            target=self._loop.run_forever, name="search-loop", daemon=True
+        )
+        self._loop_thread.start()
+        atexit.register(self.shutdown)
+
+    def start_search(self, request_id: str, coro) -> Future:
+        """Schedule a search coroutine on the shared event loop."""
+        future = asyncio.run_coroutine_threadsafe(coro, self._loop)
+        request = self._requests.get(request_id)
+        if request:
+            request.future = future
+
+        def mark_cancelled(done: Future):
+            if done.cancelled():
+                self.update_request_status(request_id, 'cancelled')
+
+        future.add_done_callback(mark_cancelled)
+        return future
+
+    def shutdown(self):
+        """Stop the shared event loop, cancel unfinished searches and release its resources."""
+        if self._loop.is_closed():
+            return
+        if self._loop.is_running():
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._loop_thread.join()
+        
+        # The loop is stopped, so it can be driven from this thread to wind down
+        pending = asyncio.all_tasks(self._loop)
+        for task in pending:
+            task.cancel()
+        if pending:
+            self._loop.run_until_complete(asyncio.gather(*pending, return_exceptions=True))
+        self._loop.run_until_complete(self._loop.shutdown_asyncgens())
+        # Not loop.shutdown_default_executor(), which needs Python 3.9
+        self._executor.shutdown(wait=True)
+        self._loop.close()
 
     def add_request(self, prompt_variables: Dict[str, str], web_search: bool = False, custom_prompt: Optional[str] = None) -> str:
-        # Use first prompt variable value for request ID, or fallback to uuid
+        """Register a pending request. The request keeps prompt_variables as-is, so callers must not mutate it afterwards."""
+        # Use first prompt variable value for request ID, plus a random hex suffix
         first_value = next(iter(prompt_variables.values()), "") if prompt_variables else ""
-        request_id = first_value[:15] + str(uuid.uuid4())[:6]
+        request_id = first_value[:15] + secrets.token_hex(3)
         request = SearchRequest(
             id=request_id,
-            prompt_variables=prompt_variables.copy(),
+            prompt_variables=prompt_variables,
             timestamp=datetime.now(),
             status='pending',
             web_search=web_search,
@@ -51,34 +108,30 @@ class SearchManager:
         )
         
         with self._lock:
-            self._requests.append(request)
+            self._requests = MappingProxyType({**self._requests, request_id: request})
         
         return request_id
 
     def get_request(self, request_id: str) -> Optional[SearchRequest]:
-        with self._lock:
-            for request in self._requests:
-                if request.id == request_id:
-                    return request
-        return None
+        return self._requests.get(request_id)
 
     def get_all_requests(self) -> List[SearchRequest]:
-        """Get all requests sorted by timestamp."""
-        with self._lock:
-            return sorted(self._requests, key=lambda x: x.timestamp, reverse=True)
+        """Get all requests, newest first."""
+        # Requests are only ever appended, so insertion order is creation order
+        return list(reversed(self._requests.values()))
 
     def update_request_status(self, request_id: str, status: str, result: str = None, error: str = None, partial_result: str = None):
+        request = self._requests.get(request_id)
+        if not request:
+            return
         with self._lock:
-            for request in self._requests:
-                if request.id == request_id:
-                    request.status = status
-                    if result:
-                        request.result = result
-                    if error:
-                        request.error = error
-                    if partial_result is not None:
-                        request.partial_result = partial_result
-                    break
+            request.status = status
+            if result:
+                request.result = result
+            if error:
+                request.error = error
+            if partial_result is not None:
+                request.partial_result = partial_result
 
 
 
@@ -89,7 +142,15 @@ def get_search_manager() -> SearchManager:
     return SearchManager()
 
 
+@st.cache_resource
+def get_openai_client() -> OpenAIClient:
+    """Get a shared OpenAIClient so HTTP connections are reused across searches."""
+    return OpenAIClient()
+
+
+@st.cache_data(ttl=60, show_spinner=False)
 def load_config() -> Dict[str, Any]:
+    """Load config/config.json, re-reading it at most once a minute."""
     try:
         with open('config/config.json', 'r') as f:
             return json.load(f)
@@ -281,19 +342,18 @@ def main():
             thinking_msg = "💭 Processing (this may take 30-60 seconds)" if input_type == "initial" else "💭 Processing..."
             message_placeholder.markdown(thinking_msg)
             
-            # Run the async function
-            full_response = ""
-            client = OpenAIClient()
+            client = get_openai_client()
             
-            # Stream the response
+            # Determine if we should use prompt_id or system_prompt
+            prompt_id = None if system_prompt.strip() else config.get('default_prompt_id')
+            actual_system_prompt = system_prompt.strip() if system_prompt.strip() else None
+            previous_response_id = st.session_state.conversation_id
+            
+            # Stream the response (runs on the search loop, so no Streamlit calls here)
             async def stream_response():
-                nonlocal full_response
+                full_response = ""
                 search_manager.update_request_status(request_id, 'running')
                 
-                # Determine if we should use prompt_id or system_prompt
-                prompt_id = None if system_prompt.strip() else config.get('default_prompt_id')
-                actual_system_prompt = system_prompt.strip() if system_prompt.strip() else None
-                
                 async for delta in client.stream_content(
                     model=model,
                     system_prompt=actual_system_prompt,
@@ -301,59 +361,75 @@ def main():
                     user_prompt=processed_user_input,
                     mcp_tools=mcp_tools if mcp_tools else None,
                     web_search=web_search_enabled,
-                    previous_response_id=st.session_state.conversation_id
+                    previous_response_id=previous_response_id
                 ):
                     full_response += delta
-                    # Update the placeholder with current response
-                    message_placeholder.markdown(full_response + "▌")
                     # Update partial result in request
                     search_manager.update_request_status(request_id, 'streaming', partial_result=full_response)
                 
-                # Get complete response with annotations and tool calls
+                # Get complete response with annotations and tool calls. The client is
+                # shared, but every search runs on the same loop and nothing awaits
+                # between the end of the stream and this call.
                 complete_response = client.get_last_streaming_response()
                 
-                # Store response ID for conversation continuity
-                if complete_response and complete_response.response_id:
-                    st.session_state.conversation_id = complete_response.response_id
-                
                 # Format final response with annotations and tool calls
-                final_response = full_response
+                sections = [full_response]
                 
                 if complete_response:
                     # Add annotations as hyperlinks
                     if complete_response.annotations:
-                        final_response += "\n\n**Sources:**\n"
+                        sections.append("\n\n**Sources:**\n")
                         # Track unique sources
                         seen_sources = set()
                         counter = 1
                         for annotation in complete_response.annotations:
                             if annotation.source:
                                 if annotation.source not in seen_sources:
-                                    final_response += f"{counter}. [{annotation.content}]({annotation.source})\n"
+                                    sections.append(f"{counter}. [{annotation.content}]({annotation.source})\n")
                                     seen_sources.add(annotation.source)
                                     counter += 1
                             else:
-                                final_response += f"{counter}. {annotation.content}\n"
+                                sections.append(f"{counter}. {annotation.content}\n")
                                 counter += 1
                     
                     # Add tool calls information
                     if complete_response.tool_calls:
-                        final_response += "\n\n**Tools Used:**\n"
+                        sections.append("\n\n**Tools Used:**\n")
                         # Track unique tool names
                         seen_tools = set()
                         for tool_call in complete_response.tool_calls:
                             if tool_call.name not in seen_tools:
-                                final_response += f"- {tool_call.name}\n"
+                                sections.append(f"- {tool_call.name}\n")
                                 seen_tools.add(tool_call.name)
                 
-                # Final update without cursor
-                message_placeholder.markdown(final_response)
+                final_response = "".join(sections)
+                
                 search_manager.update_request_status(request_id, 'completed', result=final_response)
                 
-                return final_response
+                response_id = complete_response.response_id if complete_response else None
+                return final_response, response_id
+            
+            # Run the search on the shared loop and render progress from here
+            future = search_manager.start_search(request_id, stream_response())
+            try:
+                while not future.done():
+                    request = search_manager.get_request(request_id)
+                    if request and request.partial_result:
+                        message_placeholder.markdown(request.partial_result + "▌")
+                    time.sleep(POLL_INTERVAL_SECONDS)
+            finally:
+                # A rerun or disconnect interrupts this loop; stop the stream so it
+                # doesn't keep spending tokens and holding a concurrency slot
+                if not future.done():
+                    future.cancel()
+            result, response_id = future.result()
+            
+            # Store response ID for conversation continuity
+            if response_id:
+                st.session_state.conversation_id = response_id
             
-            # Run the async function
-            result = asyncio.run(stream_response())
+            # Final update without cursor
+            message_placeholder.markdown(result)
             
             # Add assistant response to chat history
             st.session_state.messages.append({
@@ -2,6 +2,14 @@
 import json
 from typing import Dict, List, Any, Optional, Tuple
 
+_JSON_DECODER = json.JSONDecoder()
+_REFERENCES_KEYS = frozenset({'references', 'References', 'REFERENCES'})
+
+
+def _is_references_key(key: str) -> bool:
+    """Case-insensitive match on 'references' without lowercasing every key."""
+    return key in _REFERENCES_KEYS or (len(key) == 10 and key.lower() == 'references')
+
 
 def _flatten_deep_nested(obj: Any, level: int = 0) -> Any:
     """Convert deeply nested structures to strings at level 2+."""
@@ -12,6 +20,8 @@ def _flatten_deep_nested(obj: Any, level: int = 0) -> Any:
         elif isinstance(obj, list):
             items = [f"{i}: {item}" for i, item in enumerate(obj)]
             return "\n\n".join(items)
+        elif isinstance(obj, str):
+            return obj
         else:
             return str(obj)
     else:
@@ -23,65 +33,115 @@ def _flatten_deep_nested(obj: Any, level: int = 0) -> Any:
             return obj
 
 
-def _remove_references(obj: Any) -> Any:
-    """Remove 'references' fields recursively."""
-    if isinstance(obj, dict):
-        return {k: _remove_references(v) for k, v in obj.items() if k.lower() != 'references'}
-    elif isinstance(obj, list):
-        return [_remove_references(item) for item in obj]
-    else:
-        return obj
+def _append_reference_records(value: Any, path: str, results: List[Dict[str, str]]):
+    """Append the records held by a 'references' field, tagged with their path."""
+    if isinstance(value, list):
+        for item in value:
+            if isinstance(item, dict):
+                results.append({**item, 'path': path})
+    elif isinstance(value, dict):
+        results.append({**value, 'path': path})
 
 
 def _extract_references(obj: Any, path: str = "") -> List[Dict[str, str]]:
     """Extract all 'references' fields with their paths."""
     results = []
+    # Explicit stack instead of recursion; entries are (emit_records, data, path).
+    # Children are pushed in reverse so they pop in document order.
+    stack = [(False, obj, path)]
     
-    def traverse(data: Any, current_path: str):
+    while stack:
+        emit_records, data, current_path = stack.pop()
+        if emit_records:
+            _append_reference_records(data, current_path, results)
+            continue
+        
+        pending = []
         if isinstance(data, dict):
             for key, value in data.items():
                 new_path = f"{current_path}_{key}" if current_path else key
                 
-                if key.lower() == 'references':
-                    if isinstance(value, list):
-                        for item in value:
-                            if isinstance(item, dict):
-                                result = item.copy()
-                                result['path'] = new_path
-                                results.append(result)
-                    elif isinstance(value, dict):
-                        result = value.copy()
-                        result['path'] = new_path
-                        results.append(result)
+                if _is_references_key(key):
+                    pending.append((True, value, new_path))
                 
                 if isinstance(value, (dict, list)):
-                    traverse(value, new_path)
+                    pending.append((False, value, new_path))
         elif isinstance(data, list):
             for i, item in enumerate(data):
-                traverse(item, f"{current_path}_{i}" if current_path else str(i))
+                pending.append((False, item, f"{current_path}_{i}" if current_path else str(i)))
+        stack.extend(reversed(pending))
     
-    traverse(obj, path)
     return results
 
 
 def extract_json_from_response(response_text: str) -> Tuple[Optional[Dict], str]:
     """Extract JSON from response text."""
     start = response_text.find('{')
-    end = response_text.rfind('}') + 1
+    if start == -1:
+        return None, response_text
+    
+    # Decode in place from the first brace; this stops at its matching '}' so
+    # braces in trailing prose don't widen the slice
+    try:
+        data, end = _JSON_DECODER.raw_decode(response_text, start)
+        return data, response_text[start:end]
+    except json.JSONDecodeError:
+        pass
     
-    if start != -1 and end > start:
-        json_part = response_text[start:end]
-        try:
-            return json.loads(json_part), json_part
-        except json.JSONDecodeError:
-            return None, json_part
+    end = response_text.rfind('}') + 1
+    if end > start:
+        return None, response_text[start:end]
     return None, response_text
 
 
+def _split_references(obj: Any, path: str, references: List[Dict[str, str]]) -> Any:
+    """Return obj without 'references' fields, collecting them into references in one walk."""
+    if not isinstance(obj, (dict, list)):
+        return obj
+    
+    cleaned_root = {} if isinstance(obj, dict) else []
+    # Explicit stack like _extract_references; entries are (data, path, cleaned),
+    # where cleaned is the empty copy to fill, or None for a 'references' field
+    # whose records are collected when it pops so they stay in document order
+    stack = [(obj, path, cleaned_root)]
+    
+    while stack:
+        data, current_path, cleaned = stack.pop()
+        if cleaned is None:
+            _append_reference_records(data, current_path, references)
+            # Dropped from the cleaned copy, but references nested inside still count
+            if isinstance(data, (dict, list)):
+                references.extend(_extract_references(data, current_path))
+            continue
+        
+        pending = []
+        if isinstance(data, dict):
+            for key, value in data.items():
+                new_path = f"{current_path}_{key}" if current_path else key
+                if _is_references_key(key):
+                    pending.append((value, new_path, None))
+                elif isinstance(value, (dict, list)):
+                    cleaned[key] = {} if isinstance(value, dict) else []
+                    pending.append((value, new_path, cleaned[key]))
+                else:
+                    cleaned[key] = value
+        else:
+            for i, item in enumerate(data):
+                item_path = f"{current_path}_{i}" if current_path else str(i)
+                if isinstance(item, (dict, list)):
+                    cleaned.append({} if isinstance(item, dict) else [])
+                    pending.append((item, item_path, cleaned[-1]))
+                else:
+                    cleaned.append(item)
+        stack.extend(reversed(pending))
+    
+    return cleaned_root
+
+
 def extract_and_clean_json(json_data: Dict) -> Tuple[Dict, List[Dict[str, str]]]:
     """Extract references and return cleaned JSON."""
-    references = _extract_references(json_data)
-    cleaned = _remove_references(json_data)
+    references = []
+    cleaned = _split_references(json_data, "", references)
     return cleaned, references
 
 
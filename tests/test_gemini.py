@@ -0,0 +1,344 @@
+#!/usr/bin/env python3
+"""
+Unit tests for GeminiClient.
+The genai API calls are replaced with stubbed responses, so no API keys are needed.
+"""
+import asyncio
+import logging
+import random
+import re
+from types import SimpleNamespace
+
+import sys
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from google.genai import errors
+
+from rosescout.api import gemini
+from rosescout.api.gemini import GeminiAPIError, GeminiClient
+
+
+# The regex _extract_vertex_links replaced, kept as its reference
+VERTEX_LINK_PATTERN = re.compile(r'<a[^>]+href="([^"]+)"[^>]*>')
+
+
+class FakePrompt:
+    def __init__(self, text):
+        self.text = text
+
+    def compile(self, **variables):
+        return self.text
+
+
+class FakeGeneration:
+    """Records the updates made to a generation opened with start_generation."""
+
+    def __init__(self, **kwargs):
+        self.updates = [kwargs]
+        self.trace_metadata = []
+        self.ended = False
+
+    def update(self, **kwargs):
+        self.updates.append(kwargs)
+
+    def update_trace(self, *, metadata):
+        self.trace_metadata.append(metadata)
+
+    def end(self):
+        self.ended = True
+
+    def field(self, name):
+        """The last value set for a field."""
+        return [update[name] for update in self.updates if name in update][-1]
+
+
+class FakeLangfuse:
+    """Records what GeminiClient sends to Langfuse."""
+
+    def __init__(self):
+        self.trace_metadata = []
+        self.generation_updates = []
+        self.generations = []
+
+    def start_generation(self, **kwargs):
+        self.generations.append(FakeGeneration(**kwargs))
+        return self.generations[-1]
+
+    def create_prompt(self, *, name, type, prompt, labels):
+        return FakePrompt(prompt)
+
+    def get_prompt(self, name):
+        return FakePrompt(f"prompt {name}")
+
+    def update_current_generation(self, **kwargs):
+        self.generation_updates.append(kwargs)
+
+    def update_current_trace(self, *, metadata):
+        self.trace_metadata.append(metadata)
+
+
+class FakeModels:
+    """Stands in for genai's aio.models, returning or raising results in order."""
+
+    def __init__(self, results):
+        self.results = list(results)
+        self.calls = []
+
+    async def generate_content(self, **kwargs):
+        self.calls.append(kwargs)
+        result = self.results.pop(0)
+        if isinstance(result, BaseException):
+            raise result
+        return result
+
+    async def generate_content_stream(self, **kwargs):
+        self.calls.append(kwargs)
+        chunks = self.results.pop(0)
+
+        async def stream():
+            for chunk in chunks:
+                yield chunk
+
+        return stream()
+
+
+class StubbedGeminiClient(GeminiClient):
+    """GeminiClient whose API calls and Langfuse updates go to fakes."""
+
+    def __init__(self, results=()):
+        super().__init__(api_key="test-key")
+        self._langfuse = FakeLangfuse()
+        self.models = FakeModels(results)
+
+    @property
+    def _client(self):
+        return SimpleNamespace(aio=SimpleNamespace(models=self.models))
+
+
+def make_api_error(code):
+    return errors.APIError(code, {"error": {"code": code, "message": "stubbed error", "status": "STUBBED"}})
+
+
+def make_part(text=None, thought=None, function_call=None):
+    return SimpleNamespace(text=text, thought=thought, function_call=function_call, function_response=None)
+
+
+def make_grounding_metadata(chunks=(), search_entry_html=None):
+    return SimpleNamespace(
+        grounding_chunks=list(chunks),
+        web_search_queries=["query"],
+        search_entry_point=SimpleNamespace(rendered_content=search_entry_html) if search_entry_html else None,
+    )
+
+
+def make_response(text="answer", grounding_metadata=None):
+    candidate = SimpleNamespace(
+        content=SimpleNamespace(parts=[make_part(text)]),
+        grounding_metadata=grounding_metadata,
+    )
+    return SimpleNamespace(
+        candidates=[candidate],
+        model_version="gemini-test",
+        response_id="response-1",
+        usage_metadata=None,
+        text=text,
+    )
+
+
+
+def test_genai_client_shared_per_event_loop():
+    async def clients():
+        first, second = GeminiClient(api_key="test-key"), GeminiClient(api_key="test-key")
+        other_key = GeminiClient(api_key="other-key")
+        assert first._client is second._client
+        assert first._client is not other_key._client
+        return first._client
+
+    # A new loop gets a new genai.Client, since connections are bound to their loop
+    assert asyncio.run(clients()) is not asyncio.run(clients())
+
+
+def test_generate_content_cache_hit_replays_a_copy_of_the_metadata():
+    client = StubbedGeminiClient([make_response("first"), make_response("second")])
+
+    async def run():
+        first = await client.generate_content(model="m", prompt="p", use_cache=True)
+        # Mutating the metadata sent for the first call must not leak into the cache
+        client._langfuse.trace_metadata[0]["vertex_links"].append("changed")
+        second = await client.generate_content(model="m", prompt="p", use_cache=True)
+        uncached = await client.generate_content(model="m", prompt="p")
+        return first, second, uncached
+
+    assert asyncio.run(run()) == ("first", "first", "second")
+    assert len(client.models.calls) == 2
+    assert client._langfuse.trace_metadata[1]["vertex_links"] == []
+    assert client._langfuse.trace_metadata[1]["response_id"] == "response-1"
+
+
+def test_generation_config_is_copied_per_request():
+    def lookup_tool():
+        """A stand-in tool function."""
+
+    client = StubbedGeminiClient()
+    first = client._build_generation_config([lookup_tool])
+    first.tools.append(print)
+    second = client._build_generation_config([lookup_tool])
+    assert second is not first
+    assert second.tools == [lookup_tool]
+    assert second.response_mime_type == "text/plain"
+
+
+def test_stream_content_records_prompt_and_metadata_on_its_generation():
+    grounding = make_grounding_metadata(
+        [SimpleNamespace(web=SimpleNamespace(title="Source", uri="https://source"))],
+        '<a class="chip" href="https://vertex/1">one</a>',
+    )
+    client = StubbedGeminiClient([[make_response("Hel"), make_response("lo", grounding)]])
+
+    async def run():
+        return [chunk async for chunk in client.stream_content(model="m", prompt="p")]
+
+    assert asyncio.run(run()) == ["Hel", "lo"]
+    generation, = client._langfuse.generations
+    assert generation.field("model") == "m"
+    assert generation.field("prompt").text == "p"
+    assert generation.field("output") == "Hello"
+    assert generation.ended
+    metadata, = generation.trace_metadata
+    assert metadata["grounding_sources"] == [{"title": "Source", "uri": "https://source"}]
+    assert metadata["vertex_links"] == ["https://vertex/1"]
+    # Nothing relies on a current span, which the stream body doesn't run in
+    assert client._langfuse.generation_updates == [] and client._langfuse.trace_metadata == []
+
+
+def test_generate_content_batch_returns_api_errors_in_place():
+    client = StubbedGeminiClient([make_response("one"), make_api_error(400), make_response("three")])
+    requests = [{"model": "m", "prompt": f"p{i}"} for i in range(3)]
+    # One call at a time, so the stubbed results are consumed in request order
+    results = asyncio.run(client.generate_content_batch(requests, max_concurrency=1))
+    assert results[0] == "one" and results[2] == "three"
+    assert isinstance(results[1], GeminiAPIError)
+
+
+def test_generate_content_batch_propagates_other_exceptions():
+    client = StubbedGeminiClient([make_response("one")])
+    requests = [{"model": "m", "prompt": "p"}, {"model": "m", "prompt": "p", "unknown_argument": 1}]
+    try:
+        asyncio.run(client.generate_content_batch(requests))
+    except TypeError:
+        pass
+    else:
+        raise AssertionError("TypeError was not raised")
+
+
+def test_extract_vertex_links_matches_the_old_regex():
+    cases = [
+        '<a class="chip" href="https://a">A</a><a href="https://b">B</a>',
+        '<a data-href="x">',
+        '<abbr href="y">',
+        '<a href="a" href="b">',
+        '<a href="p>q">',
+        '<a\nhref="newline">',
+        '<a href="">',
+        '<a href="unterminated>',
+        '<a href="no-closing-bracket"',
+        '<link href="not-an-anchor">',
+        '<a title="x>" href="after-bracket">',
+        '<a href="x<a href=y">z">',
+        '',
+        'no links',
+    ]
+    client = StubbedGeminiClient()
+    for html in cases:
+        assert client._extract_vertex_links(html) == VERTEX_LINK_PATTERN.findall(html), html
+
+    rng = random.Random(0)
+    atoms = ['<a', '<a ', ' ', '\n', 'href="', '"', '>', 'x', 'data-', 'bbr', '<', 'href=']
+    for _ in range(20000):
+        html = ''.join(rng.choice(atoms) for _ in range(rng.randint(1, 12)))
+        assert client._extract_vertex_links(html) == VERTEX_LINK_PATTERN.findall(html), html
+
+
+def _generate_with_results(results):
+    """Run one generate_content call against results, without backoff delays."""
+    client = StubbedGeminiClient(results)
+    base_delay = gemini.RETRY_BASE_DELAY_SECONDS
+    gemini.RETRY_BASE_DELAY_SECONDS = 0
+    try:
+        return asyncio.run(client.generate_content(model="m", prompt="p")), len(client.models.calls)
+    except GeminiAPIError as e:
+        return e, len(client.models.calls)
+    finally:
+        gemini.RETRY_BASE_DELAY_SECONDS = base_delay
+
+
+def test_generate_content_retries_rate_limits_and_unavailable_errors():
+    result, calls = _generate_with_results([make_api_error(429), make_api_error(503), make_response("ok")])
+    assert (result, calls) == ("ok", 3)
+
+
+def test_generate_content_does_not_retry_other_errors():
+    result, calls = _generate_with_results([make_api_error(400), make_response("unused")])
+    assert isinstance(result, GeminiAPIError) and calls == 1
+
+
+def test_generate_content_gives_up_after_max_retries():
+    result, calls = _generate_with_results([make_api_error(429)] * (gemini.MAX_RETRIES + 1))
+    assert isinstance(result, GeminiAPIError) and calls == gemini.MAX_RETRIES + 1
+
+
+def test_grounding_sources_skip_chunks_without_web_data():
+    grounding = make_grounding_metadata([
+        SimpleNamespace(web=SimpleNamespace(title="First", uri="https://first")),
+        SimpleNamespace(web=None),
+        SimpleNamespace(web=SimpleNamespace(title=None, uri="https://untitled")),
+    ])
+    sources = StubbedGeminiClient()._extract_grounding_sources(grounding)
+    assert [(source.title, source.uri) for source in sources] == [
+        ("First", "https://first"), (None, "https://untitled")
+    ]
+    assert StubbedGeminiClient()._extract_grounding_sources(None) == []
+
+
+def test_generate_content_joins_text_parts_and_logs_tool_calls():
+    def lookup_tool():
+        """A stand-in tool function."""
+
+    response = make_response()
+    response.candidates[0].content.parts = [
+        make_part("thinking...", thought=True),
+        make_part("Hello, "),
+        make_part(function_call=SimpleNamespace(name="lookup_tool", args={"q": "x"})),
+        make_part("world"),
+    ]
+    client = StubbedGeminiClient([response])
+
+    logged = []
+    handler = logging.Handler()
+    handler.emit = lambda record: logged.append(record.getMessage())
+    previous_level = gemini.logger.level
+    gemini.logger.addHandler(handler)
+    gemini.logger.setLevel(logging.INFO)
+    try:
+        text = asyncio.run(client.generate_content(model="m", prompt="p", tools=[lookup_tool]))
+    finally:
+        gemini.logger.removeHandler(handler)
+        gemini.logger.setLevel(previous_level)
+
+    # Thought parts are left out of the answer
+    assert text == "Hello, world"
+    assert "🔧 Tool used: lookup_tool" in logged
+    assert "   Arguments: {'q': 'x'}" in logged
+
+
+def main():
+    tests = [value for name, value in globals().items() if name.startswith('test_') and callable(value)]
+    for test in tests:
+        test()
+        print(f"✅ {test.__name__}")
+    print(f"\n{len(tests)} tests passed")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+Unit tests for OpenAIClient.
+The Responses API is replaced with stubbed responses, so no API keys are needed.
+"""
+import asyncio
+from types import SimpleNamespace
+
+import sys
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from rosescout.api.gpt import Annotation, OpenAIClient, ToolCall
+
+
+class FakeResponses:
+    """Stands in for client.responses, returning results in order."""
+
+    def __init__(self, results):
+        self.results = list(results)
+        self.calls = []
+
+    async def create(self, **kwargs):
+        self.calls.append(kwargs)
+        return self.results.pop(0)
+
+
+def make_client(results=(), **kwargs) -> OpenAIClient:
+    client = OpenAIClient(api_key="test-key", **kwargs)
+    client.client = SimpleNamespace(responses=FakeResponses(results))
+    return client
+
+
+def make_response(text="answer", response_id="response-1"):
+    return {
+        'id': response_id,
+        'model': 'gpt-test',
+        'output': [{'type': 'message', 'content': [{'type': 'output_text', 'text': text, 'annotations': []}]}],
+    }
+
+
+async def stream_events(events):
+    for event in events:
+        yield event
+
+
+def delta(text):
+    return SimpleNamespace(type='response.output_text.delta', delta=text)
+
+
+def stream_chunks(events, **kwargs):
+    client = make_client([stream_events(events)])
+
+    async def run():
+        return [chunk async for chunk in client.stream_content(user_prompt="p", **kwargs)]
+
+    return asyncio.run(run()), client
+
+
+def test_generate_content_cache_hit_returns_a_copy():
+    client = make_client([make_response("first"), make_response("second")])
+
+    async def run():
+        first = await client.generate_content(user_prompt="p", use_cache=True)
+        first.tool_calls.append("changed")
+        second = await client.generate_content(user_prompt="p", use_cache=True)
+        # Web search results are live, so those calls skip the cache
+        searched = await client.generate_content(user_prompt="p", use_cache=True, web_search=True)
+        return first, second, searched
+
+    first, second, searched = asyncio.run(run())
+    assert second.text == "first" and second.tool_calls == []
+    assert searched.text == "second"
+    assert len(client.client.responses.calls) == 2
+
+
+def test_reasoning_is_only_sent_to_reasoning_models():
+    models = ["o3", "o4-mini", "gpt-5", "gpt-5-mini", "gpt-5-chat-latest", "gpt-4.1"]
+    client = make_client([make_response() for _ in models])
+
+    async def run():
+        for model in models:
+            await client.generate_content(model=model, user_prompt="p")
+
+    asyncio.run(run())
+    sent = {call["model"]: "reasoning" in call for call in client.client.responses.calls}
+    assert sent == {
+        "o3": True, "o4-mini": True, "gpt-5": True, "gpt-5-mini": True,
+        "gpt-5-chat-latest": False, "gpt-4.1": False,
+    }
+
+
+def test_extract_response_data_dispatches_each_output_type():
+    message = SimpleNamespace(type='message', content=[
+        SimpleNamespace(type='output_text', text='answer', annotations=[
+            SimpleNamespace(type='url_citation', title='Source', url='https://source'),
+        ]),
+        SimpleNamespace(type='refusal'),
+    ])
+    response = SimpleNamespace(
+        id='response-1',
+        model='gpt-test',
+        usage=SimpleNamespace(total_tokens=3, input_tokens=1, output_tokens=2),
+        output=[
+            {'type': 'web_search_call', 'query': 'q', 'status': 'completed', 'results': ['hit']},
+            SimpleNamespace(type='web_search_call', query='q2', status='completed', output=['hit2']),
+            {'type': 'mcp_call', 'name': 'distance', 'arguments': {'a': 1}, 'output': '42'},
+            SimpleNamespace(type='function_call', name='lookup', arguments={'b': 2}, output=None),
+            {'type': 'reasoning'},
+            message,
+        ],
+    )
+    result = make_client()._extract_response_data(response)
+    assert result.text == 'answer'
+    assert result.annotations == [Annotation(type='url_citation', content='Source', source='https://source')]
+    assert result.tool_calls == [
+        ToolCall(name='web_search', arguments={'query': 'q', 'status': 'completed'}, output=['hit']),
+        ToolCall(name='web_search', arguments={'query': 'q2', 'status': 'completed'}, output=['hit2']),
+        ToolCall(name='distance', arguments={'a': 1}, output='42'),
+        ToolCall(name='lookup', arguments={'b': 2}, output=None),
+    ]
+    assert result.usage == {'total_tokens': 3, 'input_tokens': 1, 'output_tokens': 2}
+    assert (result.response_id, result.model) == ('response-1', 'gpt-test')
+
+
+def test_stream_content_coalesces_deltas_and_flushes_on_other_events():
+    completed = make_response("abcdefgh")
+    events = [
+        delta("a"), delta("b"), delta("c"),
+        SimpleNamespace(type='response.output_item.added'),
+        delta("de"), delta("fg"), delta("h"),
+        SimpleNamespace(type='response.completed', response=completed),
+    ]
+    # With the timer out of the way, only other events, buffer_size and the end flush
+    chunks, client = stream_chunks(events, buffer_size=4, flush_seconds=60)
+    assert chunks == ["abc", "defg", "h"]
+    assert client.get_last_streaming_response().text == "abcdefgh"
+
+    # flush_seconds=0 yields every delta as it arrives
+    chunks, _ = stream_chunks([delta("a"), delta("b"), delta("c")], flush_seconds=0)
+    assert chunks == ["a", "b", "c"]
+
+
+def main():
+    tests = [value for name, value in globals().items() if name.startswith('test_') and callable(value)]
+    for test in tests:
+        test()
+        print(f"✅ {test.__name__}")
+    print(f"\n{len(tests)} tests passed")
+
+
+if __name__ == "__main__":
+    main()
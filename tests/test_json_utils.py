@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+"""
+Tests for the JSON utilities.
+Checks the rewritten helpers against the original implementations they replaced.
+"""
+import json
+import random
+
+import sys
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from rosescout.utils import (
+    extract_json_from_response,
+    extract_and_clean_json,
+    limit_json_nesting_to_level2,
+)
+
+
+# Original implementations, kept as the reference for the rewritten helpers
+
+def reference_remove_references(obj):
+    if isinstance(obj, dict):
+        return {k: reference_remove_references(v) for k, v in obj.items() if k.lower() != 'references'}
+    elif isinstance(obj, list):
+        return [reference_remove_references(item) for item in obj]
+    else:
+        return obj
+
+
+def reference_extract_references(obj, path=""):
+    results = []
+
+    def traverse(data, current_path):
+        if isinstance(data, dict):
+            for key, value in data.items():
+                new_path = f"{current_path}_{key}" if current_path else key
+
+                if key.lower() == 'references':
+                    if isinstance(value, list):
+                        for item in value:
+                            if isinstance(item, dict):
+                                result = item.copy()
+                                result['path'] = new_path
+                                results.append(result)
+                    elif isinstance(value, dict):
+                        result = value.copy()
+                        result['path'] = new_path
+                        results.append(result)
+
+                if isinstance(value, (dict, list)):
+                    traverse(value, new_path)
+        elif isinstance(data, list):
+            for i, item in enumerate(data):
+                traverse(item, f"{current_path}_{i}" if current_path else str(i))
+
+    traverse(obj, path)
+    return results
+
+
+def reference_extract_json_from_response(response_text):
+    start = response_text.find('{')
+    end = response_text.rfind('}') + 1
+
+    if start != -1 and end > start:
+        json_part = response_text[start:end]
+        try:
+            return json.loads(json_part), json_part
+        except json.JSONDecodeError:
+            return None, json_part
+    return None, response_text
+
+
+def reference_flatten_deep_nested(obj, level=0):
+    if level >= 2:
+        if isinstance(obj, dict):
+            return "\n\n".join(f"{k.upper()}: {v}" for k, v in obj.items())
+        elif isinstance(obj, list):
+            return "\n\n".join(f"{i}: {item}" for i, item in enumerate(obj))
+        else:
+            return str(obj)
+    else:
+        if isinstance(obj, dict):
+            return {k: reference_flatten_deep_nested(v, level + 1) for k, v in obj.items()}
+        elif isinstance(obj, list):
+            return [reference_flatten_deep_nested(item, level + 1) for item in obj]
+        else:
+            return obj
+
+
+def reference_limit_json_nesting_to_level2(json_data):
+    result = {}
+    for key, value in json_data.items():
+        if isinstance(value, dict):
+            result[key] = {
+                k2: reference_flatten_deep_nested(v2, 2) if isinstance(v2, (dict, list)) and v2 else v2
+                for k2, v2 in value.items()
+            }
+        elif isinstance(value, list):
+            result[key] = [
+                reference_flatten_deep_nested(item, 2) if isinstance(item, (dict, list)) else item
+                for item in value
+            ]
+        else:
+            result[key] = value
+    return result
+
+
+KEYS = ['references', 'References', 'REFERENCES', 'rEfErEnCeS', 'refs', 'url', 'title', 'referencesX', 'a']
+
+
+def random_json(rng, depth=0):
+    """Build a random nested structure with plenty of references keys."""
+    if depth > 4 or rng.random() < 0.3:
+        return rng.choice([1, 2.5, 'text', '', None, True])
+    if rng.random() < 0.5:
+        return {rng.choice(KEYS): random_json(rng, depth + 1) for _ in range(rng.randint(0, 4))}
+    return [random_json(rng, depth + 1) for _ in range(rng.randint(0, 3))]
+
+
+def test_extract_and_clean_json_matches_reference():
+    rng = random.Random(0)
+    for _ in range(2000):
+        data = {'root': random_json(rng), 'references': random_json(rng)}
+        cleaned, references = extract_and_clean_json(data)
+        assert cleaned == reference_remove_references(data)
+        assert references == reference_extract_references(data)
+
+
+def test_extract_and_clean_json_nested_references():
+    data = {
+        'summary': 'x',
+        'references': [{'url': 'a', 'references': {'url': 'b'}}],
+        'items': [{'References': {'url': 'c'}}],
+    }
+    cleaned, references = extract_and_clean_json(data)
+    assert cleaned == {'summary': 'x', 'items': [{}]}
+    assert references == [
+        {'url': 'a', 'references': {'url': 'b'}, 'path': 'references'},
+        {'url': 'b', 'path': 'references_0_references'},
+        {'url': 'c', 'path': 'items_0_References'},
+    ]
+
+
+def test_extract_and_clean_json_matches_references_key_in_any_case():
+    data = {
+        'references': {'url': 'a'},
+        'REFERENCES': {'url': 'b'},
+        'rEfErEnCeS': {'url': 'c'},
+        'referencesX': {'url': 'kept'},
+        'refs': {'url': 'kept'},
+    }
+    cleaned, references = extract_and_clean_json(data)
+    assert cleaned == {'referencesX': {'url': 'kept'}, 'refs': {'url': 'kept'}}
+    assert [ref['url'] for ref in references] == ['a', 'b', 'c']
+
+
+def test_extract_and_clean_json_deep_nesting():
+    # Deeper than the recursion limit; both walks use explicit stacks
+    depth = 5000
+    data = {'references': {'url': 'bottom'}}
+    for _ in range(depth):
+        data = {'a': [data]}
+    cleaned, references = extract_and_clean_json(data)
+    assert references == [{'url': 'bottom', 'path': '_'.join(['a_0'] * depth) + '_references'}]
+    for _ in range(depth):
+        cleaned = cleaned['a'][0]
+    assert cleaned == {}
+
+
+def test_limit_json_nesting_to_level2_matches_reference():
+    rng = random.Random(1)
+    for _ in range(2000):
+        data = {str(i): random_json(rng) for i in range(rng.randint(0, 4))}
+        assert limit_json_nesting_to_level2(data) == reference_limit_json_nesting_to_level2(data)
+
+
+def test_extract_json_from_response_matches_reference():
+    cases = [
+        'no json',
+        '',
+        'pre {"a": {"b": 1}} post',
+        ' {"a": "}"} ',
+        '{"a":1',
+        '{bad} {"a":1}',
+        '}{',
+    ]
+    for text in cases:
+        assert extract_json_from_response(text) == reference_extract_json_from_response(text), text
+
+
+def test_extract_json_from_response_returns_first_object():
+    # A trailing brace in prose used to widen the slice and fail the parse
+    assert extract_json_from_response('x {"a":1} and then } oops') == ({'a': 1}, '{"a":1}')
+    # With two objects, the first one is returned instead of None
+    assert extract_json_from_response('{"a":1} and {"b":2}') == ({'a': 1}, '{"a":1}')
+
+
+def test_extract_json_from_response_falls_back_to_brace_slice():
+    # When decoding fails, the first-'{' to last-'}' slice is still returned
+    assert extract_json_from_response('see {not json} here') == (None, '{not json}')
+
+
+def main():
+    tests = [value for name, value in globals().items() if name.startswith('test_') and callable(value)]
+    for test in tests:
+        test()
+        print(f"✅ {test.__name__}")
+    print(f"\n{len(tests)} tests passed")
+
+
+if __name__ == "__main__":
+    main()
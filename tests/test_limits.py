@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+Tests for the shared API client limits.
+"""
+import asyncio
+import os
+import time
+
+import sys
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from rosescout.api.limits import ConcurrencyLimit, RateLimiter, read_int_env
+
+ENV_NAME = "ROSESCOUT_TEST_LIMIT"
+
+
+def _read_with(value):
+    if value is None:
+        os.environ.pop(ENV_NAME, None)
+    else:
+        os.environ[ENV_NAME] = value
+    try:
+        return read_int_env(ENV_NAME, 8, minimum=1)
+    finally:
+        os.environ.pop(ENV_NAME, None)
+
+
+def test_read_int_env_defaults_when_unset_or_empty():
+    assert _read_with(None) == 8
+    assert _read_with("") == 8
+    assert _read_with(" 3 ") == 3
+
+
+def test_read_int_env_rejects_invalid_values():
+    for value in ["0", "-2", "abc", "1.5"]:
+        try:
+            _read_with(value)
+        except ValueError as e:
+            assert ENV_NAME in str(e)
+        else:
+            raise AssertionError(f"{value!r} was accepted")
+
+
+def test_concurrency_limit_rejects_non_positive_limits():
+    for limit in [0, -1]:
+        try:
+            ConcurrencyLimit(limit)
+        except ValueError:
+            pass
+        else:
+            raise AssertionError(f"{limit} was accepted")
+
+
+async def _max_in_flight(limit: ConcurrencyLimit, calls: int) -> int:
+    in_flight = 0
+    peak = 0
+
+    async def call():
+        nonlocal in_flight, peak
+        async with limit:
+            in_flight += 1
+            peak = max(peak, in_flight)
+            await asyncio.sleep(0.001)
+            in_flight -= 1
+
+    await asyncio.gather(*(call() for _ in range(calls)))
+    return peak
+
+
+def test_concurrency_limit_caps_in_flight_calls():
+    assert asyncio.run(_max_in_flight(ConcurrencyLimit(3), 10)) == 3
+
+
+def test_concurrency_limit_works_across_event_loops():
+    # A single asyncio.Semaphore would stay bound to the first loop it waited on
+    limit = ConcurrencyLimit(2)
+    assert asyncio.run(_max_in_flight(limit, 6)) == 2
+    assert asyncio.run(_max_in_flight(limit, 6)) == 2
+
+
+def test_rate_limiter_rejects_negative_rpm():
+    try:
+        RateLimiter(-1)
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("-1 was accepted")
+
+
+async def _start_offsets(limiter: RateLimiter, calls: int, start: float = None):
+    """Seconds from start (default: now) at which each of calls concurrent waits returned."""
+    start = time.monotonic() if start is None else start
+
+    async def call():
+        await limiter.wait()
+        return time.monotonic() - start
+
+    return sorted(await asyncio.gather(*(call() for _ in range(calls))))
+
+
+def test_rate_limiter_spaces_out_requests():
+    # 600 rpm is one request every 0.1s
+    offsets = asyncio.run(_start_offsets(RateLimiter(600), 4))
+    for i, offset in enumerate(offsets):
+        assert i * 0.1 - 0.01 <= offset < i * 0.1 + 0.05, offsets
+    # 0 disables the limit
+    assert max(asyncio.run(_start_offsets(RateLimiter(0), 4))) < 0.05
+
+
+def test_rate_limiter_reuses_slots_of_cancelled_waiters():
+    async def scenario():
+        limiter = RateLimiter(600)
+        start = time.monotonic()
+        await limiter.wait()  # slot 0.0
+        middle = asyncio.ensure_future(limiter.wait())  # slot 0.1
+        last = asyncio.ensure_future(limiter.wait())  # slot 0.2
+        await asyncio.sleep(0)
+        middle.cancel()
+        last.cancel()
+        await asyncio.gather(middle, last, return_exceptions=True)
+        # Both reservations were given back, so the next callers get 0.1 and 0.2
+        # instead of 0.3 and 0.4
+        return await _start_offsets(limiter, 2, start)
+
+    offsets = asyncio.run(scenario())
+    assert 0.09 <= offsets[0] < 0.15 and 0.19 <= offsets[1] < 0.25, offsets
+
+
+def main():
+    tests = [value for name, value in globals().items() if name.startswith('test_') and callable(value)]
+    for test in tests:
+        test()
+        print(f"✅ {test.__name__}")
+    print(f"\n{len(tests)} tests passed")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""
+Tests for the response cache shared by the API clients.
+"""
+import time
+
+import sys
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from rosescout.api.response_cache import ResponseCache, cache_key
+
+
+def test_cache_key_ignores_dict_order():
+    assert cache_key({"model": "m", "input": "x"}) == cache_key({"input": "x", "model": "m"})
+    assert cache_key({"model": "m", "input": "x"}) != cache_key({"model": "m", "input": "y"})
+
+
+def test_response_cache_expires_entries():
+    cache = ResponseCache(ttl_seconds=0.05)
+    cache.set("k", "value")
+    assert cache.get("k") == "value"
+    time.sleep(0.06)
+    assert cache.get("k") is None
+    assert len(cache) == 0
+
+
+def test_response_cache_evicts_least_recently_used():
+    cache = ResponseCache(max_entries=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1 and cache.get("c") == 3
+
+
+def test_response_cache_returns_copies():
+    cache = ResponseCache()
+    stored = {"sources": ["a"]}
+    cache.set("k", stored)
+    stored["sources"].append("changed after set")
+    hit = cache.get("k")
+    hit["sources"].append("changed after get")
+    assert cache.get("k") == {"sources": ["a"]}
+
+
+def main():
+    tests = [value for name, value in globals().items() if name.startswith('test_') and callable(value)]
+    for test in tests:
+        test()
+        print(f"✅ {test.__name__}")
+    print(f"\n{len(tests)} tests passed")
+
+
+if __name__ == "__main__":
+    main()